@@ -47,3 +47,9 @@ ROOT_SYSTEM_USER = "root"
 GR_MAX_MEMBERS = 9
 HOSTNAME_DETAILS = "hostname-details"
 COS_AGENT_RELATION_NAME = "cos-agent"
+LOGROTATE_CONFIG_FILE = "/etc/logrotate.d/flush_mysql_logs"
+LOGROTATE_CRON_FILE = "/etc/cron.d/flush_mysql_logs"
+LOGROTATE_CRON = (
+    f"* 1-23 * * * root logrotate -f {LOGROTATE_CONFIG_FILE}\n"
+    f"1-59 0 * * * root logrotate -f {LOGROTATE_CONFIG_FILE}\n"
+)
@@ -3,15 +3,20 @@
 
 """Helper class to manage the MySQL InnoDB cluster lifecycle with MySQL Shell."""
 
+import functools
+import grp
+import itertools
 import logging
 import os
 import pathlib
-import shutil
+import pwd
+import socket
+import stat
 import subprocess
 import tempfile
-from typing import Dict, List, Optional, Tuple
+import typing
+from typing import Dict, List, Optional, Tuple, Union
 
-import jinja2
 from charms.mysql.v0.mysql import (
     BYTES_1MB,
     Error,
@@ -27,7 +32,17 @@ from charms.mysql.v0.mysql import (
 )
 from charms.operator_libs_linux.v1 import snap
 from ops.charm import CharmBase
-from tenacity import RetryError, Retrying, retry, stop_after_attempt, stop_after_delay, wait_fixed
+from tenacity import (
+    RetryCallState,
+    RetryError,
+    Retrying,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential,
+    wait_random,
+)
 from typing_extensions import override
 
 from constants import (
@@ -41,6 +56,9 @@ from constants import (
     CHARMED_MYSQLD_EXPORTER_SERVICE,
     CHARMED_MYSQLD_SERVICE,
     CHARMED_MYSQLSH,
+    LOGROTATE_CONFIG_FILE,
+    LOGROTATE_CRON,
+    LOGROTATE_CRON_FILE,
     MYSQL_DATA_DIR,
     MYSQL_SYSTEM_USER,
     MYSQLD_CONFIG_DIRECTORY,
@@ -51,6 +69,9 @@ from constants import (
     XTRABACKUP_PLUGIN_DIR,
 )
 
+if typing.TYPE_CHECKING:
+    import jinja2
+
 logger = logging.getLogger(__name__)
 
 
@@ -144,7 +165,7 @@ class MySQL(MySQLBase):
             snap.SnapNotFoundError, snap.SnapError: if issue installing charmed-mysql snap
         """
         logger.debug("Retrieving snap cache")
-        cache = snap.SnapCache()
+        cache = _snap_cache()
         charmed_mysql = cache[CHARMED_MYSQL_SNAP_NAME]
         # This charm can override/use an existing snap installation only if the snap was previously
         # installed by this charm.
@@ -179,11 +200,11 @@ class MySQL(MySQLBase):
 
             # fix ownership necessary for upgrades from 8/stable@r151
             # TODO: remove once snap post-refresh fixes the permission
-            if common_path.owner() != MYSQL_SYSTEM_USER:
+            if os.stat(common_path).st_uid != _uid(MYSQL_SYSTEM_USER):
                 logger.debug("Updating charmed-mysql common directory ownership")
-                os.system(f"chown -R {MYSQL_SYSTEM_USER} {CHARMED_MYSQL_COMMON_DIRECTORY}")
+                _chown_recursively(CHARMED_MYSQL_COMMON_DIRECTORY, _uid(MYSQL_SYSTEM_USER))
 
-            subprocess.run(["snap", "alias", "charmed-mysql.mysql", "mysql"], check=True)
+            _snap_alias(CHARMED_MYSQL, "mysql")
 
             installed_by_mysql_server_file.touch(exist_ok=True)
         except snap.SnapError:
@@ -198,17 +219,7 @@ class MySQL(MySQLBase):
     @override
     def get_available_memory(self) -> int:
         """Retrieves the total memory of the server where mysql is running."""
-        try:
-            logger.debug("Querying system total memory")
-            with open("/proc/meminfo") as meminfo:
-                for line in meminfo:
-                    if "MemTotal" in line:
-                        return int(line.split()[1]) * 1024
-
-            raise MySQLGetAvailableMemoryError
-        except OSError:
-            logger.error("Failed to query system memory")
-            raise MySQLGetAvailableMemoryError
+        return _total_memory()
 
     def write_mysqld_config(self, profile: str, memory_limit: Optional[int]) -> None:
         """Create custom mysql config file.
@@ -246,8 +257,7 @@ class MySQL(MySQLBase):
         """Create and write the logrotate config file."""
         logger.debug("Creating logrotate config file")
 
-        with open("templates/logrotate.j2", "r") as file:
-            template = jinja2.Template(file.read())
+        template = _get_template("logrotate.j2")
 
         rendered = template.render(
             system_user=MYSQL_SYSTEM_USER,
@@ -256,19 +266,29 @@ class MySQL(MySQLBase):
             unit_name=self.charm.unit.name,
         )
 
-        with open("/etc/logrotate.d/flush_mysql_logs", "w") as file:
-            file.write(rendered)
-
-        cron = (
-            "* 1-23 * * * root logrotate -f /etc/logrotate.d/flush_mysql_logs\n"
-            "1-59 0 * * * root logrotate -f /etc/logrotate.d/flush_mysql_logs\n"
+        self.write_content_to_file(
+            path=LOGROTATE_CONFIG_FILE,
+            content=rendered,
+            owner=ROOT_SYSTEM_USER,
+            group=ROOT_SYSTEM_USER,
+            permission=0o644,
+        )
+        self.write_content_to_file(
+            path=LOGROTATE_CRON_FILE,
+            content=LOGROTATE_CRON,
+            owner=ROOT_SYSTEM_USER,
+            group=ROOT_SYSTEM_USER,
+            permission=0o644,
         )
-        with open("/etc/cron.d/flush_mysql_logs", "w") as file:
-            file.write(cron)
 
     def reset_root_password_and_start_mysqld(self) -> None:
         """Reset the root user password and start mysqld."""
         logger.debug("Resetting root user password and starting mysqld")
+        try:
+            uid, gid = _uid(MYSQL_SYSTEM_USER), _gid(ROOT_SYSTEM_USER)
+        except KeyError:
+            raise MySQLResetRootPasswordAndStartMySQLDError("Failed to resolve mysql system user")
+
         with tempfile.NamedTemporaryFile(
             dir=MYSQLD_CONFIG_DIRECTORY,
             prefix="z-custom-init-file.",
@@ -290,15 +310,8 @@ class MySQL(MySQLBase):
                 _sql_file.flush()
 
                 try:
-                    subprocess.check_output(
-                        [
-                            "sudo",
-                            "chown",
-                            f"{MYSQL_SYSTEM_USER}:{ROOT_SYSTEM_USER}",
-                            _sql_file.name,
-                        ]
-                    )
-                except subprocess.CalledProcessError:
+                    os.fchown(_sql_file.fileno(), uid, gid)
+                except OSError:
                     raise MySQLResetRootPasswordAndStartMySQLDError(
                         "Failed to change permissions for temp SQL file"
                     )
@@ -307,15 +320,8 @@ class MySQL(MySQLBase):
                 _custom_config_file.flush()
 
                 try:
-                    subprocess.check_output(
-                        [
-                            "sudo",
-                            "chown",
-                            f"{MYSQL_SYSTEM_USER}:{ROOT_SYSTEM_USER}",
-                            _custom_config_file.name,
-                        ]
-                    )
-                except subprocess.CalledProcessError:
+                    os.fchown(_custom_config_file.fileno(), uid, gid)
+                except OSError:
                     raise MySQLResetRootPasswordAndStartMySQLDError(
                         "Failed to change permissions for custom mysql config"
                     )
@@ -333,15 +339,16 @@ class MySQL(MySQLBase):
                 except MySQLServiceNotRunningError:
                     raise MySQLResetRootPasswordAndStartMySQLDError("mysqld service not running")
 
-    @retry(reraise=True, stop=stop_after_delay(120), wait=wait_fixed(5))
+    @retry(reraise=True, stop=stop_after_delay(120), wait=wait_exponential(multiplier=0.1, max=5))
     def wait_until_mysql_connection(self, check_port: bool = True) -> None:
         """Wait until a connection to MySQL has been obtained.
 
-        Retry every 5 seconds for 120 seconds if there is an issue obtaining a connection.
+        Retry with exponential backoff (starting at 0.1 seconds, capped at 5 seconds)
+        for 120 seconds if there is an issue obtaining a connection.
         """
         logger.debug("Waiting for MySQL connection")
 
-        if not os.path.exists(MYSQLD_SOCK_FILE):
+        if not self.is_mysqld_running():
             raise MySQLServiceNotRunningError("MySQL socket file not found")
 
         if check_port and not self.check_mysqlsh_connection():
@@ -364,8 +371,8 @@ class MySQL(MySQLBase):
             MYSQLD_SOCK_FILE,
             CHARMED_MYSQL_COMMON_DIRECTORY,
             MYSQLD_DEFAULTS_CONFIG_FILE,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def delete_temp_backup_directory(
@@ -374,8 +381,8 @@ class MySQL(MySQLBase):
         """Delete the temp backup directory."""
         super().delete_temp_backup_directory(
             from_directory,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def retrieve_backup_with_xbcloud(
@@ -390,8 +397,8 @@ class MySQL(MySQLBase):
             CHARMED_MYSQL_COMMON_DIRECTORY,
             CHARMED_MYSQL_XBCLOUD_LOCATION,
             CHARMED_MYSQL_XBSTREAM_LOCATION,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def prepare_backup_for_restore(self, backup_location: str) -> Tuple[str, str]:
@@ -400,16 +407,16 @@ class MySQL(MySQLBase):
             backup_location,
             CHARMED_MYSQL_XTRABACKUP_LOCATION,
             XTRABACKUP_PLUGIN_DIR,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def empty_data_files(self) -> None:
         """Empty the mysql data directory in preparation of the restore."""
         super().empty_data_files(
             MYSQL_DATA_DIR,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def restore_backup(
@@ -422,17 +429,10 @@ class MySQL(MySQLBase):
         try:
             # provide write permissions to root (group owner of the data directory)
             # so the root user can move back files into the data directory
-            command = f"chmod 770 {MYSQL_DATA_DIR}".split()
-            subprocess.run(
-                command,
-                user=ROOT_SYSTEM_USER,
-                group=ROOT_SYSTEM_USER,
-                capture_output=True,
-                text=True,
-            )
-        except subprocess.CalledProcessError as e:
+            os.chmod(MYSQL_DATA_DIR, 0o770)
+        except OSError as e:
             logger.exception("Failed to change data directory permissions before restoring")
-            raise MySQLRestoreBackupError(e)
+            raise MySQLRestoreBackupError(str(e))
 
         stdout, stderr = super().restore_backup(
             backup_location,
@@ -440,36 +440,20 @@ class MySQL(MySQLBase):
             MYSQLD_DEFAULTS_CONFIG_FILE,
             MYSQL_DATA_DIR,
             XTRABACKUP_PLUGIN_DIR,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
         try:
-            # Revert permissions for the data directory
-            command = f"chmod 750 {MYSQL_DATA_DIR}".split()
-            subprocess.run(
-                command,
-                user=ROOT_SYSTEM_USER,
-                group=ROOT_SYSTEM_USER,
-                capture_output=True,
-                text=True,
-            )
-
-            # Change ownership to the snap_daemon user since the restore files
-            # are owned by root
-            command = f"chown -R {MYSQL_SYSTEM_USER}:{ROOT_SYSTEM_USER} {MYSQL_DATA_DIR}".split()
-            subprocess.run(
-                command,
-                user=ROOT_SYSTEM_USER,
-                group=ROOT_SYSTEM_USER,
-                capture_output=True,
-                text=True,
-            )
-        except subprocess.CalledProcessError as e:
+            # Revert permissions for the data directory and change ownership to the
+            # snap_daemon user since the restore files are owned by root
+            os.chmod(MYSQL_DATA_DIR, 0o750)
+            _chown_recursively(MYSQL_DATA_DIR, _uid(MYSQL_SYSTEM_USER), _gid(ROOT_SYSTEM_USER))
+        except OSError as e:
             logger.exception(
-                "Failed to change data directory permissions or ownershp after restoring"
+                "Failed to change data directory permissions or ownership after restoring"
             )
-            raise MySQLRestoreBackupError(e)
+            raise MySQLRestoreBackupError(str(e))
 
         return (stdout, stderr)
 
@@ -477,25 +461,25 @@ class MySQL(MySQLBase):
         """Delete the temp restore directory from the mysql data directory."""
         super().delete_temp_restore_directory(
             CHARMED_MYSQL_COMMON_DIRECTORY,
-            user=ROOT_SYSTEM_USER,
-            group=ROOT_SYSTEM_USER,
+            user=_uid(ROOT_SYSTEM_USER),
+            group=_gid(ROOT_SYSTEM_USER),
         )
 
     def _execute_commands(
         self,
         commands: List[str],
         bash: bool = False,
-        user: str = None,
-        group: str = None,
+        user: Optional[Union[str, int]] = None,
+        group: Optional[Union[str, int]] = None,
         env_extra: Dict = None,
     ) -> Tuple[str, str]:
         """Execute commands on the server where mysql is running.
 
         Args:
             commands: a list containing the commands to execute
-            bash: whether to run the commands with bash
-            user: the user with which to execute the commands
-            group: the group with which to execute the commands
+            bash: whether the commands form a pipeline, with stages separated by "|"
+            user: the user (name or uid) with which to execute the commands
+            group: the group (name or gid) with which to execute the commands
             env_extra: the environment variables to add to the current process’ environment
 
         Returns: tuple of (stdout, stderr)
@@ -507,7 +491,7 @@ class MySQL(MySQLBase):
             env.update(env_extra)
         try:
             if bash:
-                commands = ["bash", "-c", "set -o pipefail; " + " ".join(commands)]
+                return self._run_pipeline(commands, user=user, group=group, env=env)
 
             process = subprocess.run(
                 commands,
@@ -523,9 +507,86 @@ class MySQL(MySQLBase):
             logger.debug(f"Failed command: {commands}; user={user}; group={group}")
             raise MySQLExecError(e.stderr)
 
+    @staticmethod
+    def _run_pipeline(
+        commands: List[str],
+        user: Optional[Union[str, int]] = None,
+        group: Optional[Union[str, int]] = None,
+        env: Optional[Dict] = None,
+    ) -> Tuple[str, str]:
+        """Run a pipeline of commands without spawning a shell.
+
+        The commands are split into stages on "|" tokens, and each stage is chained to
+        the next one through a pipe. As with `set -o pipefail`, the pipeline fails if
+        any of its stages fails.
+
+        Args:
+            commands: a list containing the pipeline tokens
+            user: the user (name or uid) with which to execute the commands
+            group: the group (name or gid) with which to execute the commands
+            env: the environment of the executed commands
+
+        Returns: tuple of (stdout, stderr)
+
+        Raises: subprocess.CalledProcessError if any of the stages fails
+        """
+        stages = [
+            list(stage)
+            for is_separator, stage in itertools.groupby(commands, lambda token: token == "|")
+            if not is_separator
+        ]
+        processes = []
+
+        # all stages share a single stderr file (as they would in a shell), which avoids
+        # deadlocks when an upstream stage writes more than a pipe buffer to stderr
+        with tempfile.TemporaryFile() as stderr_file:
+            try:
+                for stage in stages:
+                    process = subprocess.Popen(
+                        stage,
+                        stdin=processes[-1].stdout if processes else None,
+                        stdout=subprocess.PIPE,
+                        stderr=stderr_file,
+                        user=user,
+                        group=group,
+                        env=env,
+                    )
+                    if processes:
+                        # let the previous stage receive SIGPIPE if this one exits early
+                        processes[-1].stdout.close()
+                    processes.append(process)
+            except OSError:
+                for process in processes:
+                    process.kill()
+                    process.wait()
+                raise
+
+            stdout, _ = processes[-1].communicate()
+            for process in processes[:-1]:
+                process.wait()
+
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8")
+
+        stdout = stdout.decode("utf-8")
+        for process in reversed(processes):
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    process.returncode, process.args, output=stdout, stderr=stderr
+                )
+
+        return (stdout.strip(), stderr.strip())
+
     def is_mysqld_running(self) -> bool:
-        """Returns whether mysqld is running."""
-        return os.path.exists(MYSQLD_SOCK_FILE)
+        """Returns whether mysqld is running.
+
+        A stale regular file in place of the socket is not considered as running.
+        """
+        try:
+            sock_stat = os.stat(MYSQLD_SOCK_FILE)
+        except FileNotFoundError:
+            return False
+        return stat.S_ISSOCK(sock_stat.st_mode)
 
     def is_server_connectable(self) -> bool:
         """Returns whether the server is connectable."""
@@ -590,16 +651,17 @@ class MySQL(MySQLBase):
         Raises
             snap.SnapError: if an issue occurs during config setting or restart
         """
-        cache = snap.SnapCache()
+        cache = _snap_cache()
         mysqld_snap = cache[CHARMED_MYSQL_SNAP_NAME]
 
         try:
             # Set up exporter credentials
-            mysqld_snap.set(
+            _snap_set(
+                mysqld_snap,
                 {
                     "exporter.user": self.monitoring_user,
                     "exporter.password": self.monitoring_password,
-                }
+                },
             )
             snap_service_operation(
                 CHARMED_MYSQL_SNAP_NAME, CHARMED_MYSQLD_EXPORTER_SERVICE, "start"
@@ -634,8 +696,13 @@ class MySQL(MySQLBase):
         Returns:
             String representing the output of the mysqlsh command
         """
+        # Scripts embed credentials, so they go through a private file rather than argv.
         # Use the self.mysqlsh_common_dir for the confined mysql-shell snap.
         with tempfile.NamedTemporaryFile(mode="w", dir=CHARMED_MYSQL_COMMON_DIRECTORY) as _file:
+            # need to change ownership since charmed-mysql.mysqlsh runs as
+            # snap_daemon; the file keeps its owner-only 0600 mode
+            os.fchown(_file.fileno(), _uid(MYSQL_SYSTEM_USER), _gid(ROOT_SYSTEM_USER))
+
             _file.write(script)
             _file.flush()
 
@@ -648,13 +715,14 @@ class MySQL(MySQLBase):
             ]
 
             try:
-                # need to change permissions since charmed-mysql.mysqlsh runs as
-                # snap_daemon
-                shutil.chown(_file.name, user="snap_daemon", group="root")
-
-                return subprocess.check_output(
-                    command, stderr=subprocess.PIPE, timeout=timeout
-                ).decode("utf-8")
+                return subprocess.run(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=timeout,
+                    check=True,
+                    text=True,
+                ).stdout
             except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
                 raise MySQLClientError(e.stderr)
 
@@ -686,9 +754,14 @@ class MySQL(MySQLBase):
             command.append(f"--password={password}")
 
         try:
-            return subprocess.check_output(
-                command, stderr=subprocess.PIPE, timeout=timeout
-            ).decode("utf-8")
+            return subprocess.run(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+                check=True,
+                text=True,
+            ).stdout
         except subprocess.CalledProcessError as e:
             raise MySQLClientError(e.stderr)
 
@@ -699,10 +772,8 @@ class MySQL(MySQLBase):
             A bool for an initialised and integral data dir.
         """
         try:
-            content = os.listdir(MYSQL_DATA_DIR)
-
             # minimal expected content for an integral mysqld data-dir
-            expected_content = {
+            remaining_content = {
                 "mysql",
                 "public_key.pem",
                 "sys",
@@ -723,7 +794,14 @@ class MySQL(MySQLBase):
                 "performance_schema",
             }
 
-            return expected_content <= set(content)
+            # stop scanning as soon as all expected entries have been seen
+            with os.scandir(MYSQL_DATA_DIR) as entries:
+                for entry in entries:
+                    remaining_content.discard(entry.name)
+                    if not remaining_content:
+                        return True
+
+            return False
         except FileNotFoundError:
             return False
 
@@ -744,33 +822,156 @@ class MySQL(MySQLBase):
             group: file group
             permission: file permission
         """
-        with open(path, "w", encoding="utf-8") as fd:
-            fd.write(content)
+        # resolve the ids first, so an unknown user or group leaves the file untouched
+        uid, gid = _uid(owner), _gid(group)
+
+        fd = os.open(path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, permission)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            os.fchown(file.fileno(), uid, gid)
+            # the creation mode above does not apply to pre-existing files
+            os.fchmod(file.fileno(), permission)
+            file.write(content)
+
+
+@functools.lru_cache(maxsize=1)
+def _jinja_environment() -> "jinja2.Environment":
+    """Return the jinja2 environment for the charm templates directory.
+
+    jinja2 is imported lazily, as only a few hooks render templates.
+    """
+    import jinja2
+
+    return jinja2.Environment(loader=jinja2.FileSystemLoader("templates"))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_template(name: str) -> "jinja2.Template":
+    """Load and parse a template from the charm templates directory, once per name."""
+    return _jinja_environment().get_template(name)
+
+
+@functools.lru_cache(maxsize=1)
+def _snap_cache() -> snap.SnapCache:
+    """Return the snap cache, shared across calls to avoid re-querying snapd."""
+    return snap.SnapCache()
+
+
+def _log_snap_retry(retry_state: RetryCallState) -> None:
+    """Log a failed snap operation attempt before retrying it."""
+    logger.warning(
+        f"Snap operation {retry_state.fn.__name__} failed on attempt "
+        f"{retry_state.attempt_number}, retrying"
+    )
+
+
+# retry snap service and config operations, which are known to fail transiently;
+# the install path is retried as a whole by the charm's install_workload
+_snap_retry = retry(
+    retry=retry_if_exception_type(snap.SnapError),
+    wait=wait_exponential(multiplier=1, max=30) + wait_random(0, 0.5),
+    stop=stop_after_attempt(3),
+    before_sleep=_log_snap_retry,
+    reraise=True,
+)
+
+
+@_snap_retry
+def _snap_set(selected_snap: snap.Snap, config: Dict[str, str]) -> None:
+    """Set snap configuration options, retrying on transient snapd failures."""
+    selected_snap.set(config)
+
 
-        shutil.chown(path, owner, group)
-        os.chmod(path, mode=permission)
+def _snap_alias(app: str, alias: str) -> None:
+    """Create an alias for a snap application.
+
+    The snap library in use does not expose aliases, so the snap CLI is used, with
+    failures surfaced as snap.SnapError like the other snap operations. It runs in the
+    install path, which the charm retries as a whole.
+    """
+    command = ["snap", "alias", app, alias]
+    try:
+        subprocess.run(command, capture_output=True, check=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise snap.SnapError(f"Command {command!r} failed with output = {e.stderr!r}")
+
+
+@functools.lru_cache(maxsize=1)
+def _total_memory() -> int:
+    """Return the machine's total memory in bytes, read once from /proc/meminfo.
+
+    The total memory does not change during the charm's lifetime, and MySQL instances are
+    built per use by the charm, so the value is cached at module level.
+    """
+    try:
+        logger.debug("Querying system total memory")
+        with open("/proc/meminfo") as meminfo:
+            line = next(line for line in meminfo if line.startswith("MemTotal"))
+    except StopIteration:
+        raise MySQLGetAvailableMemoryError
+    except OSError:
+        logger.error("Failed to query system memory")
+        raise MySQLGetAvailableMemoryError
+
+    return int(line.split()[1]) * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def _uid(user: str) -> int:
+    """Return the uid of a system user, resolved once per user."""
+    return pwd.getpwnam(user).pw_uid
+
+
+@functools.lru_cache(maxsize=None)
+def _gid(group: str) -> int:
+    """Return the gid of a system group, resolved once per group."""
+    return grp.getgrnam(group).gr_gid
+
+
+def _chown_recursively(path: str, uid: int, gid: int = -1) -> None:
+    """Recursively change ownership of a directory tree, akin to `chown -R`.
+
+    Entries already owned by the given uid/gid are skipped, so repeated calls on an
+    already-fixed tree only cost one stat per entry.
+
+    Args:
+        path: the root of the directory tree
+        uid: the target owner uid
+        gid: (optional) the target group gid, -1 to leave the group unchanged
+    """
+
+    def _chown_if_needed(entry_path: str, stat_result: os.stat_result) -> None:
+        if stat_result.st_uid != uid or (gid != -1 and stat_result.st_gid != gid):
+            os.chown(entry_path, uid, gid, follow_symlinks=False)
+
+    def _walk(directory: str) -> None:
+        # scandir caches the stat result of each entry, avoiding extra lookups
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                _chown_if_needed(entry.path, entry.stat(follow_symlinks=False))
+                if entry.is_dir(follow_symlinks=False):
+                    _walk(entry.path)
+
+    _chown_if_needed(path, os.stat(path, follow_symlinks=False))
+    _walk(path)
 
 
 def is_volume_mounted() -> bool:
     """Returns if data directory is attached."""
     try:
-        for attempt in Retrying(stop=stop_after_attempt(10), wait=wait_fixed(12)):
+        for attempt in Retrying(
+            stop=stop_after_delay(60), wait=wait_exponential(multiplier=0.5, max=8)
+        ):
             with attempt:
-                subprocess.check_call(["mountpoint", "-q", CHARMED_MYSQL_COMMON_DIRECTORY])
+                if not os.path.ismount(CHARMED_MYSQL_COMMON_DIRECTORY):
+                    raise RuntimeError(f"{CHARMED_MYSQL_COMMON_DIRECTORY} is not mounted")
     except RetryError:
         return False
     return True
 
 
-def instance_hostname():
+def instance_hostname() -> str:
     """Retrieve machine hostname."""
-    try:
-        raw_hostname = subprocess.check_output(["hostname"])
-
-        return raw_hostname.decode("utf8").strip()
-    except subprocess.CalledProcessError as e:
-        logger.exception("Failed to retrieve hostname", e)
-        return None
+    return socket.gethostname()
 
 
 def snap_service_operation(snapname: str, service: str, operation: str) -> bool:
@@ -789,22 +990,28 @@ def snap_service_operation(snapname: str, service: str, operation: str) -> bool:
         raise SnapServiceOperationError(f"Invalid snap service operation {operation}")
 
     try:
-        cache = snap.SnapCache()
+        cache = _snap_cache()
         selected_snap = cache[snapname]
 
         if not selected_snap.present:
             raise SnapServiceOperationError(f"Snap {snapname} not installed")
 
-        if operation == "restart":
-            selected_snap.restart(services=[service])
-            return selected_snap.services[service]["active"]
-        elif operation == "start":
-            selected_snap.start(services=[service], enable=True)
-            return selected_snap.services[service]["active"]
-        else:
-            selected_snap.stop(services=[service], disable=True)
-            return not selected_snap.services[service]["active"]
+        return _run_snap_service_operation(selected_snap, service, operation)
     except snap.SnapError:
         error_message = f"Failed to run snap service operation, snap={snapname}, service={service}, operation={operation}"
         logger.exception(error_message)
         raise SnapServiceOperationError(error_message)
+
+
+@_snap_retry
+def _run_snap_service_operation(selected_snap: snap.Snap, service: str, operation: str) -> bool:
+    """Run an operation on a snap service, retrying on transient snapd failures."""
+    if operation == "restart":
+        selected_snap.restart(services=[service])
+        return selected_snap.services[service]["active"]
+    elif operation == "start":
+        selected_snap.start(services=[service], enable=True)
+        return selected_snap.services[service]["active"]
+    else:
+        selected_snap.stop(services=[service], disable=True)
+        return not selected_snap.services[service]["active"]
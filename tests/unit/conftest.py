@@ -1,8 +1,15 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import logging
+
 import pytest
 
+from mysql_vm_helpers import _get_template, _jinja_environment, _snap_cache, _total_memory
+
+# keep the framework's per-event debug/info records out of unit test runs
+logging.getLogger("ops").setLevel(logging.WARNING)
+
 
 @pytest.fixture(autouse=True)
 def with_juju_secrets(monkeypatch):
@@ -12,3 +19,13 @@ def with_juju_secrets(monkeypatch):
 @pytest.fixture
 def without_juju_secrets(monkeypatch):
     monkeypatch.setattr("ops.JujuVersion.has_secrets", False)
+
+
+@pytest.fixture(autouse=True)
+def clear_module_caches():
+    caches = (_get_template, _jinja_environment, _snap_cache, _total_memory)
+    for cached in caches:
+        cached.cache_clear()
+    yield
+    for cached in caches:
+        cached.cache_clear()
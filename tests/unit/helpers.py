@@ -4,10 +4,13 @@
 
 """Helper functions for writing tests."""
 
+import functools
 from typing import Callable
 from unittest.mock import patch
 
 
+# a patcher can be re-entered once exited, so decorated tests share one per address
+@functools.lru_cache(maxsize=None)
 def patch_network_get(private_address="10.1.157.116") -> Callable:
     def network_get(*args, **kwargs) -> dict:
         """Patch for the not-yet-implemented testing backend needed for `bind_address`.
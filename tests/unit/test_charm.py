@@ -1,367 +1,444 @@
 # Copyright 2022 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-import unittest
-from unittest.mock import patch
+import importlib
+from types import SimpleNamespace
+from unittest.mock import create_autospec, patch
 
 import pytest
+from charms.data_platform_libs.v0.data_interfaces import SecretCache
 from charms.mysql.v0.mysql import (
     MySQLConfigureInstanceError,
     MySQLConfigureMySQLUsersError,
     MySQLCreateClusterError,
     MySQLInitializeJujuOperationsTableError,
 )
-from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
+from ops.model import ActiveStatus, MaintenanceStatus, SecretNotFoundError
 from ops.testing import Harness
 from tenacity import Retrying, stop_after_attempt
 
-from charm import MySQLOperatorCharm
 from mysql_vm_helpers import (
+    MySQL,
     MySQLCreateCustomMySQLDConfigError,
     MySQLResetRootPasswordAndStartMySQLDError,
 )
 
 from .helpers import patch_network_get
 
+# stand-in event for handlers called directly, skipping framework dispatch
+_EVENT = SimpleNamespace(defer=lambda: None)
+_MYSQL_PROTOTYPE = create_autospec(MySQL)
+_EXPECTED_PW_KEYS = frozenset(
+    {
+        "root-password",
+        "server-config-password",
+        "cluster-admin-password",
+        "monitoring-password",
+        "backups-password",
+    }
+)
 
-class TestCharm(unittest.TestCase):
-    def setUp(self):
-        self.harness = Harness(MySQLOperatorCharm)
-        self.addCleanup(self.harness.cleanup)
-        self.harness.begin()
-        self.charm = self.harness.charm
-        self.peer_relation_id = self.harness.add_relation("database-peers", "database-peers")
-        upgrade_relation_id = self.harness.add_relation("upgrade", "upgrade")
-        self.harness.update_relation_data(
-            upgrade_relation_id, self.charm.unit.name, {"state": "idle"}
-        )
-        self.harness.add_relation_unit(self.peer_relation_id, "mysql/1")
-        self.db_router_relation_id = self.harness.add_relation("db-router", "app")
-        self.harness.add_relation_unit(self.db_router_relation_id, "app/0")
-        self.harness.add_relation("restart", "restart")
-
-    @patch_network_get(private_address="1.1.1.1")
-    @patch("upgrade.MySQLVMUpgrade.cluster_state", return_value="idle")
-    @patch("socket.getfqdn", return_value="test-hostname")
-    @patch("socket.gethostbyname", return_value="")
-    @patch("subprocess.check_call")
-    @patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
-    @patch("mysql_vm_helpers.MySQL.install_and_configure_mysql_dependencies")
-    def test_on_install(self, _install_and_configure_mysql_dependencies, ____, ___, __, _, _____):
-        self.charm.on.install.emit()
-        _install_and_configure_mysql_dependencies.assert_called_once()
-
-        self.assertTrue(isinstance(self.harness.model.unit.status, WaitingStatus))
-
-    @patch("charm.Retrying", return_value=Retrying(stop=stop_after_attempt(1)))
-    @patch("subprocess.check_call")
-    @patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
-    @patch(
-        "mysql_vm_helpers.MySQL.install_and_configure_mysql_dependencies", side_effect=Exception()
-    )
-    def test_on_install_exception(
-        self,
-        _install_and_configure_mysql_dependencies,
-        _is_volume_mounted,
-        _check_call,
-        _retrying,
-    ):
-        self.charm.on.install.emit()
 
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+def _raise(*args, **kwargs):
+    raise Exception()
 
-    @pytest.mark.usefixtures("without_juju_secrets")
-    def test_on_leader_elected_sets_mysql_passwords_in_peer_databag(self):
-        # ensure that the peer relation databag is empty
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
-        )
-        self.assertEqual(peer_relation_databag, {})
 
-        # trigger the leader_elected event
-        self.harness.set_leader(True)
+def patch_mysql(monkeypatch):
+    """Patch the charm's MySQL class with the shared autospec prototype.
 
-        # ensure passwords set in the peer relation databag
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
-        )
-        expected_peer_relation_databag_keys = [
-            "root-password",
-            "server-config-password",
-            "cluster-admin-password",
-            "monitoring-password",
-            "backups-password",
-            "cluster-name",
-            "cluster-set-domain-name",
-        ]
-        self.assertEqual(
-            sorted(peer_relation_databag.keys()), sorted(expected_peer_relation_databag_keys)
-        )
+    Returns the mocked MySQL instance, reset from any previous test.
+    """
+    _MYSQL_PROTOTYPE.reset_mock(side_effect=True)
+    mysql = _MYSQL_PROTOTYPE.return_value
+    mysql.reset_mock(return_value=True, side_effect=True)
+    monkeypatch.setattr("charm.MySQL", _MYSQL_PROTOTYPE)
+    return mysql
+
+
+def _build_harness():
+    # import the charm only once a test in this module actually runs
+    charm = importlib.import_module("charm")
+    harness = Harness(charm.MySQLOperatorCharm)
+    harness.begin()
+    peer_relation_id = harness.add_relation("database-peers", "database-peers")
+    upgrade_relation_id = harness.add_relation("upgrade", "upgrade")
+    harness.update_relation_data(upgrade_relation_id, harness.charm.unit.name, {"state": "idle"})
+    harness.add_relation_unit(peer_relation_id, "mysql/1")
+    db_router_relation_id = harness.add_relation("db-router", "app")
+    harness.add_relation_unit(db_router_relation_id, "app/0")
+    harness.add_relation("restart", "restart")
+    return harness
+
+
+@pytest.fixture(scope="module")
+def base_harness():
+    harness = _build_harness()
+    yield harness
+    harness.cleanup()
 
-    def test_on_leader_elected_sets_mysql_passwords_secret(self):
-        # ensure that the peer relation databag is empty
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
+
+@pytest.fixture
+def fresh_harness():
+    """Unshared harness, for tests driving leader election through the framework.
+
+    Leader-elected observers may defer events, which would otherwise be re-emitted
+    into later tests sharing the module harness.
+    """
+    harness = _build_harness()
+    yield harness
+    harness.cleanup()
+
+
+def _snapshot_relations(harness):
+    """Snapshot the units and databags of every relation of the harness."""
+    return {
+        relation.id: (
+            {unit.name for unit in relation.units},
+            {entity.name: dict(databag) for entity, databag in relation.data.items()},
         )
-        self.assertEqual(peer_relation_databag, {})
-
-        # trigger the leader_elected event
-        self.harness.set_leader(True)
-
-        expected_peer_relation_databag_keys = [
-            "root-password",
-            "server-config-password",
-            "cluster-admin-password",
-            "monitoring-password",
-            "backups-password",
-        ]
-
-        for key in expected_peer_relation_databag_keys:
-            self.assertTrue(self.harness.charm.get_secret("app", key).isalnum())
-
-    @patch_network_get(private_address="1.1.1.1")
-    def test_on_leader_elected_sets_config_cluster_name_in_peer_databag(self):
-        # ensure that the peer relation databag is empty
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
+        for relations in harness.model.relations.values()
+        for relation in relations
+    }
+
+
+def _rewind(harness, snapshot):
+    """Rewind a harness to a relations snapshot, dropping leader, config and peer secrets."""
+    relations = {
+        relation.id: relation
+        for relations in harness.model.relations.values()
+        for relation in relations
+    }
+    with harness.hooks_disabled():
+        # the charm's peer secrets are app- and unit-owned, so drop them while still leader
+        harness.set_leader(True)
+        for scope in ("app", "unit"):
+            try:
+                secret = harness.model.get_secret(label=f"{harness.charm.app.name}.{scope}")
+            except SecretNotFoundError:
+                continue
+            secret.remove_all_revisions()
+        # and forget the copies data_interfaces caches on the charm
+        for peer_data in (
+            harness.charm.peer_relation_app,
+            harness.charm.peer_relation_unit,
+        ):
+            peer_data.secrets = SecretCache(harness.charm, peer_data.component)
+        harness.set_leader(False)
+        for relation_id, (units, databags) in snapshot.items():
+            current_units = {unit.name for unit in relations[relation_id].units}
+            for unit in units - current_units:
+                harness.add_relation_unit(relation_id, unit)
+            for name, databag in databags.items():
+                stale = harness.get_relation_data(relation_id, name)
+                harness.update_relation_data(
+                    relation_id, name, {**dict.fromkeys(stale, ""), **databag}
+                )
+        harness.update_config(unset=list(harness.model.config))
+    harness.charm.unit.status = MaintenanceStatus()
+
+
+@pytest.fixture(scope="module")
+def base_relations(base_harness):
+    """Snapshot of the shared harness' relations right after setup."""
+    return _snapshot_relations(base_harness)
+
+
+@pytest.fixture
+def harness(base_harness, base_relations):
+    """Rewind the shared harness to its post-setup state."""
+    _rewind(base_harness, base_relations)
+    return base_harness
+
+
+@pytest.fixture(scope="module")
+def peer_relation_id(base_harness):
+    """Id of the peer relation, which lives as long as the shared harness."""
+    return base_harness.model.get_relation("database-peers").id
+
+
+@pytest.fixture
+def leader_ready(harness):
+    """Harness of a leader unit holding the peer data leader election would set."""
+    with harness.hooks_disabled():
+        harness.set_leader(True)
+        for key in _EXPECTED_PW_KEYS:
+            harness.charm.set_secret("app", key, "password")
+        harness.charm.app_peer_data.update(
+            {"cluster-name": "test-cluster", "cluster-set-domain-name": "test-cluster-set"}
         )
-        self.assertEqual(peer_relation_databag, {})
+        harness.charm.unit_peer_data["leader"] = "true"
+    return harness
+
+
+@patch_network_get(private_address="1.1.1.1")
+@patch("upgrade.MySQLVMUpgrade.cluster_state", return_value="idle")
+@patch("socket.getfqdn", return_value="test-hostname")
+@patch("socket.gethostbyname", return_value="")
+@patch("os.path.ismount", return_value=True)
+@patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
+def test_on_install(_, __, ___, ____, _____, harness, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        MySQL,
+        "install_and_configure_mysql_dependencies",
+        staticmethod(lambda: calls.append(None)),
+    )
 
-        # trigger the leader_elected and config_changed events
-        self.harness.update_config({"cluster-name": "test-cluster"})
-        self.harness.set_leader(True)
+    harness.charm._on_install(_EVENT)
+    assert len(calls) == 1
 
-        # ensure that the peer relation has 'cluster_name' set to the config value
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
-        )
+    assert harness.model.unit.status.name == "waiting"
 
-        self.assertEqual(peer_relation_databag["cluster-name"], "test-cluster")
 
-    @patch_network_get(private_address="1.1.1.1")
-    def test_on_config_changed_sets_random_cluster_name_in_peer_databag(self):
-        # ensure that the peer relation databag is empty
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
-        )
-        self.assertEqual(peer_relation_databag, {})
+@patch("charm.Retrying", return_value=Retrying(stop=stop_after_attempt(1)))
+@patch("os.path.ismount", return_value=True)
+@patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
+@patch("mysql_vm_helpers.MySQL.install_and_configure_mysql_dependencies", new=_raise)
+def test_on_install_exception(_is_volume_mounted, _ismount, _retrying, harness):
+    harness.charm._on_install(_EVENT)
 
-        # trigger the leader_elected and config_changed events
-        self.harness.set_leader(True)
-        self.charm.on.config_changed.emit()
+    assert harness.model.unit.status.name == "blocked"
 
-        # ensure that the peer relation has a randomly generated 'cluster_name'
-        peer_relation_databag = self.harness.get_relation_data(
-            self.peer_relation_id, self.harness.charm.app
-        )
 
-        self.assertIsNotNone(peer_relation_databag["cluster-name"])
-
-    @patch_network_get(private_address="1.1.1.1")
-    @patch("mysql_vm_helpers.MySQL.create_cluster_set")
-    @patch("mysql_vm_helpers.MySQL.stop_mysqld")
-    @patch("subprocess.check_call")
-    @patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
-    @patch("mysql_vm_helpers.MySQL.get_mysql_version", return_value="8.0.0")
-    @patch("mysql_vm_helpers.MySQL.connect_mysql_exporter")
-    @patch("mysql_vm_helpers.MySQL.wait_until_mysql_connection")
-    @patch("mysql_vm_helpers.MySQL.configure_mysql_users")
-    @patch("mysql_vm_helpers.MySQL.configure_instance")
-    @patch("mysql_vm_helpers.MySQL.initialize_juju_units_operations_table")
-    @patch("mysql_vm_helpers.MySQL.create_cluster")
-    @patch("mysql_vm_helpers.MySQL.reset_root_password_and_start_mysqld")
-    @patch("mysql_vm_helpers.MySQL.get_pid_of_port_3306", side_effect=["1234", "5678"])
-    @patch("mysql_vm_helpers.MySQL.write_mysqld_config")
-    @patch("mysql_vm_helpers.MySQL.setup_logrotate_and_cron")
-    def test_on_start(
-        self,
-        _setup_logrotate_and_cron,
-        _write_mysqld_config,
-        _get_pid_of_port_3306,
-        _reset_root_password_and_start_mysqld,
-        _create_cluster,
-        _initialize_juju_units_operations_table,
-        _configure_instance,
-        _configure_mysql_users,
-        _wait_until_mysql_connection,
-        _connect_mysql_exporter,
-        _get_mysql_version,
-        _is_volume_mounted,
-        _check_call,
-        _stop_mysqld,
-        _create_cluster_set,
-    ):
-        # execute on_leader_elected and config_changed to populate the peer databag
-        self.harness.set_leader(True)
-        self.charm.on.config_changed.emit()
-
-        self.charm.on.start.emit()
-
-        self.assertTrue(isinstance(self.harness.model.unit.status, ActiveStatus))
-
-    @patch_network_get(private_address="1.1.1.1")
-    @patch("mysql_vm_helpers.MySQL.stop_mysqld")
-    @patch("subprocess.check_call")
-    @patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
-    @patch("mysql_vm_helpers.MySQL.configure_mysql_users")
-    @patch("mysql_vm_helpers.MySQL.configure_instance")
-    @patch("mysql_vm_helpers.MySQL.initialize_juju_units_operations_table")
-    @patch("mysql_vm_helpers.MySQL.create_cluster")
-    @patch("mysql_vm_helpers.MySQL.reset_root_password_and_start_mysqld")
-    @patch("mysql_vm_helpers.MySQL.get_pid_of_port_3306")
-    @patch("mysql_vm_helpers.MySQL.write_mysqld_config")
-    @patch("mysql_vm_helpers.MySQL.setup_logrotate_and_cron")
-    def test_on_start_exceptions(
-        self,
-        _setup_logrotate_and_cron,
-        _write_mysqld_config,
-        _get_pid_of_port_3306,
-        _reset_root_password_and_start_mysqld,
-        _create_cluster,
-        _initialize_juju_units_operations_table,
-        _configure_instance,
-        _configure_mysql_users,
-        _is_volume_mounted,
-        _check_call,
-        _stop_mysqld,
+@pytest.mark.usefixtures("without_juju_secrets")
+def test_on_leader_elected_sets_mysql_passwords_in_peer_databag(fresh_harness):
+    # trigger the leader_elected event
+    fresh_harness.set_leader(True)
+
+    # ensure passwords set in the peer relation databag
+    assert fresh_harness.charm.app_peer_data.keys() == _EXPECTED_PW_KEYS | {
+        "cluster-name",
+        "cluster-set-domain-name",
+    }
+
+
+def test_on_leader_elected_sets_mysql_passwords_secret(fresh_harness):
+    # trigger the leader_elected event
+    fresh_harness.set_leader(True)
+
+    for key in _EXPECTED_PW_KEYS:
+        assert fresh_harness.charm.get_secret("app", key).isalnum()
+
+
+@pytest.mark.parametrize(
+    "config,is_expected_cluster_name",
+    [
+        ({"cluster-name": "test-cluster"}, lambda name: name == "test-cluster"),
+        ({}, lambda name: name.startswith("cluster-")),
+    ],
+    ids=["configured", "random"],
+)
+@patch_network_get(private_address="1.1.1.1")
+def test_on_leader_elected_sets_cluster_name_in_peer_databag(
+    fresh_harness, config, is_expected_cluster_name
+):
+    fresh_harness.update_config(config)
+    # trigger the leader_elected event
+    fresh_harness.set_leader(True)
+
+    # ensure that the peer relation has 'cluster-name' set from config or randomly generated
+    assert is_expected_cluster_name(fresh_harness.charm.app_peer_data["cluster-name"])
+
+
+@pytest.mark.usefixtures("leader_ready")
+@patch_network_get(private_address="1.1.1.1")
+@patch("os.path.ismount", return_value=True)
+@patch("subprocess.check_call")
+@patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
+def test_on_start(_is_volume_mounted, _check_call, _ismount, harness, monkeypatch):
+    for method in (
+        "create_cluster_set",
+        "stop_mysqld",
+        "connect_mysql_exporter",
+        "wait_until_mysql_connection",
+        "configure_mysql_users",
+        "configure_instance",
+        "initialize_juju_units_operations_table",
+        "create_cluster",
+        "reset_root_password_and_start_mysqld",
+        "write_mysqld_config",
+        "setup_logrotate_and_cron",
     ):
-        patch("tenacity.BaseRetrying.wait", side_effect=lambda *args, **kwargs: 0)
+        monkeypatch.setattr(MySQL, method, lambda *args, **kwargs: None)
+    pids = iter(("1234", "5678"))
+    monkeypatch.setattr(MySQL, "get_pid_of_port_3306", lambda _: next(pids))
+    monkeypatch.setattr(MySQL, "get_mysql_version", lambda _: "8.0.0")
 
-        # execute on_leader_elected and config_changed to populate the peer databag
-        self.harness.set_leader(True)
-        self.charm.on.config_changed.emit()
+    harness.charm._on_start(_EVENT)
 
-        # test an exception while configuring mysql users
-        _configure_mysql_users.side_effect = MySQLConfigureMySQLUsersError
+    assert harness.model.unit.status.name == "active"
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
 
-        _configure_mysql_users.reset_mock()
+@pytest.mark.usefixtures("leader_ready")
+@patch_network_get(private_address="1.1.1.1")
+@patch("os.path.ismount", return_value=True)
+@patch("subprocess.check_call")
+@patch("mysql_vm_helpers.is_volume_mounted", return_value=True)
+def test_on_start_exceptions(_is_volume_mounted, _check_call, _ismount, harness, monkeypatch):
+    mysql = patch_mysql(monkeypatch)
 
-        # test an exception while configuring the instance
-        _configure_instance.side_effect = MySQLConfigureInstanceError
+    # test an exception while configuring mysql users
+    mysql.configure_mysql_users.side_effect = MySQLConfigureMySQLUsersError
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
 
-        _configure_instance.reset_mock()
+    mysql.configure_mysql_users.reset_mock()
 
-        # test mysqld not restarting after configure instance
-        _get_pid_of_port_3306.side_effect = ["1234", "1234"]
+    # test an exception while configuring the instance
+    mysql.configure_instance.side_effect = MySQLConfigureInstanceError
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
 
-        _get_pid_of_port_3306.reset_mock()
+    mysql.configure_instance.reset_mock()
 
-        # test an exception initializing the mysql.juju_units_operations table
-        _initialize_juju_units_operations_table.side_effect = (
-            MySQLInitializeJujuOperationsTableError
-        )
+    # test mysqld not restarting after configure instance
+    mysql.get_pid_of_port_3306.side_effect = ["1234", "1234"]
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
 
-        _initialize_juju_units_operations_table.reset_mock()
+    mysql.get_pid_of_port_3306.reset_mock()
 
-        # test an exception with creating a cluster
-        _create_cluster.side_effect = MySQLCreateClusterError
+    # test an exception initializing the mysql.juju_units_operations table
+    mysql.initialize_juju_units_operations_table.side_effect = (
+        MySQLInitializeJujuOperationsTableError
+    )
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
 
-        # test an exception with resetting the root password and starting mysqld
-        _reset_root_password_and_start_mysqld.side_effect = (
-            MySQLResetRootPasswordAndStartMySQLDError
-        )
+    mysql.initialize_juju_units_operations_table.reset_mock()
 
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
-
-        # test an exception creating a custom mysqld config
-        _write_mysqld_config.side_effect = MySQLCreateCustomMySQLDConfigError
-
-        self.charm.on.start.emit()
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
-
-    @patch_network_get(private_address="1.1.1.1")
-    @patch("mysql_vm_helpers.MySQL.get_cluster_node_count", return_value=1)
-    @patch("mysql_vm_helpers.MySQL.get_member_state")
-    @patch("mysql_vm_helpers.MySQL.get_cluster_primary_address")
-    @patch("charm.is_volume_mounted", return_value=True)
-    @patch("mysql_vm_helpers.MySQL.reboot_from_complete_outage")
-    @patch("charm.snap_service_operation")
-    @patch("hostname_resolution.MySQLMachineHostnameResolution._remove_host_from_etc_hosts")
-    def test_on_update(
-        self,
-        _,
-        _snap_service_operation,
-        __reboot_from_complete_outage,
-        _is_volume_mounted,
-        _get_cluster_primary_address,
-        _get_member_state,
-        _get_cluster_node_count,
-    ):
-        self.harness.remove_relation_unit(self.peer_relation_id, "mysql/1")
-        self.harness.set_leader()
-        self.charm.on.config_changed.emit()
-        self.harness.update_relation_data(
-            self.peer_relation_id, self.charm.app.name, {"units-added-to-cluster": "1"}
+    # test an exception with creating a cluster
+    mysql.create_cluster.side_effect = MySQLCreateClusterError
+
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
+
+    # test an exception with resetting the root password and starting mysqld
+    mysql.reset_root_password_and_start_mysqld.side_effect = (
+        MySQLResetRootPasswordAndStartMySQLDError
+    )
+
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
+
+    # test an exception creating a custom mysqld config
+    mysql.write_mysqld_config.side_effect = MySQLCreateCustomMySQLDConfigError
+
+    harness.charm._on_start(_EVENT)
+    assert harness.model.unit.status.name == "blocked"
+
+
+@pytest.mark.usefixtures("leader_ready")
+@patch_network_get(private_address="1.1.1.1")
+@patch("mysql_vm_helpers.MySQL.get_cluster_node_count", return_value=1)
+@patch("mysql_vm_helpers.MySQL.get_member_state")
+@patch("mysql_vm_helpers.MySQL.get_cluster_primary_address")
+@patch("charm.is_volume_mounted", return_value=True)
+@patch("mysql_vm_helpers.MySQL.reboot_from_complete_outage")
+@patch("charm.snap_service_operation")
+@patch("hostname_resolution.MySQLMachineHostnameResolution._remove_host_from_etc_hosts")
+def test_on_update(
+    _,
+    _snap_service_operation,
+    __reboot_from_complete_outage,
+    _is_volume_mounted,
+    _get_cluster_primary_address,
+    _get_member_state,
+    _get_cluster_node_count,
+    harness,
+    peer_relation_id,
+):
+    with harness.hooks_disabled():
+        harness.remove_relation_unit(peer_relation_id, "mysql/1")
+        harness.update_relation_data(
+            peer_relation_id, harness.charm.app.name, {"units-added-to-cluster": "1"}
         )
-        self.harness.update_relation_data(
-            self.peer_relation_id,
-            self.charm.unit.name,
+        harness.update_relation_data(
+            peer_relation_id,
+            harness.charm.unit.name,
             {
                 "member-role": "primary",
                 "member-state": "online",
                 "unit-initialized": "true",
             },
         )
-        _get_member_state.return_value = ("online", "primary")
-
-        self.charm.on.update_status.emit()
-        _get_member_state.assert_called_once()
-        __reboot_from_complete_outage.assert_not_called()
-        _snap_service_operation.assert_not_called()
-        _is_volume_mounted.assert_called_once()
-        _get_cluster_node_count.assert_called_once()
-        _get_cluster_primary_address.assert_called_once()
-
-        self.assertTrue(isinstance(self.harness.model.unit.status, ActiveStatus))
-
-        # test instance state = offline
-        _get_member_state.reset_mock()
-        _get_cluster_primary_address.reset_mock()
-
-        _get_member_state.return_value = ("offline", "primary")
-        self.harness.update_relation_data(
-            self.peer_relation_id,
-            self.charm.unit.name,
-            {
-                "member-state": "offline",
-            },
-        )
-
-        self.charm.on.update_status.emit()
-        _get_member_state.assert_called_once()
-        __reboot_from_complete_outage.assert_called_once()
-        _snap_service_operation.assert_not_called()
-        _get_cluster_primary_address.assert_called_once()
-
-        self.assertTrue(isinstance(self.harness.model.unit.status, MaintenanceStatus))
-        # test instance state = unreachable
-        _get_member_state.reset_mock()
-        _get_cluster_primary_address.reset_mock()
-
-        __reboot_from_complete_outage.reset_mock()
-        _snap_service_operation.return_value = False
-        _get_member_state.return_value = ("unreachable", "primary")
-
-        self.charm.on.update_status.emit()
-        _get_member_state.assert_called_once()
-        __reboot_from_complete_outage.assert_not_called()
-        _snap_service_operation.assert_called_once()
-        _get_cluster_primary_address.assert_called_once()
+    _get_member_state.return_value = ("online", "primary")
+
+    harness.charm._on_update_status(_EVENT)
+    _get_member_state.assert_called_once()
+    __reboot_from_complete_outage.assert_not_called()
+    _snap_service_operation.assert_not_called()
+    _is_volume_mounted.assert_called_once()
+    _get_cluster_node_count.assert_called_once()
+    _get_cluster_primary_address.assert_called_once()
+
+    assert harness.model.unit.status.name == "active"
+
+    # test instance state = offline
+    _get_member_state.reset_mock()
+    _get_cluster_primary_address.reset_mock()
+
+    _get_member_state.return_value = ("offline", "primary")
+    harness.update_relation_data(
+        peer_relation_id,
+        harness.charm.unit.name,
+        {
+            "member-state": "offline",
+        },
+    )
 
-        self.assertTrue(isinstance(self.harness.model.unit.status, BlockedStatus))
+    harness.charm._on_update_status(_EVENT)
+    _get_member_state.assert_called_once()
+    __reboot_from_complete_outage.assert_called_once()
+    _snap_service_operation.assert_not_called()
+    _get_cluster_primary_address.assert_called_once()
+
+    assert harness.model.unit.status.name == "maintenance"
+    # test instance state = unreachable
+    _get_member_state.reset_mock()
+    _get_cluster_primary_address.reset_mock()
+
+    __reboot_from_complete_outage.reset_mock()
+    _snap_service_operation.return_value = False
+    _get_member_state.return_value = ("unreachable", "primary")
+
+    harness.charm._on_update_status(_EVENT)
+    _get_member_state.assert_called_once()
+    __reboot_from_complete_outage.assert_not_called()
+    _snap_service_operation.assert_called_once()
+    _get_cluster_primary_address.assert_called_once()
+
+    assert harness.model.unit.status.name == "blocked"
+
+
+def test_rewind_restores_post_setup_state(fresh_harness):
+    snapshot = _snapshot_relations(fresh_harness)
+    peer_relation_id = fresh_harness.model.get_relation("database-peers").id
+    app, unit = fresh_harness.charm.app, fresh_harness.charm.unit
+    with fresh_harness.hooks_disabled():
+        fresh_harness.set_leader(True)
+        fresh_harness.charm.set_secret("app", "root-password", "password")
+        fresh_harness.charm.set_secret("unit", "key", "key")
+        fresh_harness.update_relation_data(peer_relation_id, app.name, {"cluster-name": "c"})
+        fresh_harness.update_relation_data(peer_relation_id, unit.name, {"leader": "true"})
+        fresh_harness.remove_relation_unit(peer_relation_id, "mysql/1")
+        fresh_harness.update_config({"cluster-name": "test-cluster"})
+    unit.status = ActiveStatus()
+
+    _rewind(fresh_harness, snapshot)
+
+    assert not unit.is_leader()
+    assert _snapshot_relations(fresh_harness) == snapshot
+    assert "cluster-name" not in fresh_harness.model.config
+    assert unit.status.name == "maintenance"
+    for scope in ("app", "unit"):
+        with pytest.raises(SecretNotFoundError):
+            fresh_harness.model.get_secret(label=f"{app.name}.{scope}")
+    with fresh_harness.hooks_disabled():
+        fresh_harness.set_leader(True)
+    assert fresh_harness.charm.get_secret("app", "root-password") is None
+    assert fresh_harness.charm.get_secret("unit", "key") is None
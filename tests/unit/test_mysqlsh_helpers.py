@@ -4,7 +4,9 @@
 """Unit tests for MySQL class."""
 
 import os
+import socket
 import subprocess
+import tempfile
 import unittest
 from unittest.mock import MagicMock, call, mock_open, patch
 
@@ -13,13 +15,16 @@ from charms.mysql.v0.mysql import (
     MySQLExecError,
     MySQLGetAutoTunningParametersError,
     MySQLGetAvailableMemoryError,
+    MySQLRestoreBackupError,
     MySQLStartMySQLDError,
     MySQLStopMySQLDError,
 )
+from tenacity import stop_after_attempt
 
 from constants import (
     CHARMED_MYSQL_SNAP_NAME,
     CHARMED_MYSQLD_SERVICE,
+    MYSQL_DATA_DIR,
     MYSQLD_CONFIG_DIRECTORY,
     MYSQLD_CUSTOM_CONFIG_FILE,
 )
@@ -29,6 +34,11 @@ from mysql_vm_helpers import (
     MySQLResetRootPasswordAndStartMySQLDError,
     MySQLServiceNotRunningError,
     SnapServiceOperationError,
+    _chown_recursively,
+    _get_template,
+    _total_memory,
+    is_volume_mounted,
+    snap,
     snap_service_operation,
 )
 
@@ -52,33 +62,49 @@ class TestMySQL(unittest.TestCase):
         )
 
     @patch("tempfile.NamedTemporaryFile")
-    @patch("subprocess.check_output")
-    @patch("shutil.chown")
-    def test_run_mysqlsh_script(self, _chown, _check_output, _):
+    @patch("subprocess.run")
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.fchmod")
+    @patch("os.fchown")
+    def test_run_mysqlsh_script(self, _fchown, _fchmod, _uid, _gid, _run, _named_temporary_file):
         """Test a successful execution of run_mysqlsh_script."""
-        _check_output.return_value = b"stdout"
-
-        self.mysql._run_mysqlsh_script("script")
-
-        _check_output.assert_called_once()
-        _chown.assert_called_once()
+        _run.return_value.stdout = "stdout"
+
+        script = "shell.connect('user:secret@localhost')"
+        self.assertEqual(self.mysql._run_mysqlsh_script(script), "stdout")
+
+        # scripts carry credentials, so they go through a private file, never argv
+        _run.assert_called_once()
+        self.assertEqual(_run.call_args.args[0][3], "-f")
+        self.assertNotIn(script, _run.call_args.args[0])
+        _named_temporary_file.assert_called_once()
+        _named_temporary_file.return_value.__enter__.return_value.write.assert_called_once_with(
+            script
+        )
+        _fchown.assert_called_once()
+        self.assertEqual(_fchown.call_args.args[1:], (584788, 0))
+        # the temp file stays owner-only, not group-readable
+        _fchmod.assert_not_called()
 
     @patch("tempfile.NamedTemporaryFile")
-    @patch("subprocess.check_output")
-    @patch("shutil.chown")
-    def test_run_mysqlsh_script_exception(self, _, _check_output, __):
+    @patch("subprocess.run")
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.fchown")
+    def test_run_mysqlsh_script_exception(self, _, __, ___, _run, ____):
         """Test a failed execution of run_mysqlsh_script."""
-        _check_output.side_effect = subprocess.CalledProcessError(cmd="", returncode=1)
+        _run.side_effect = subprocess.CalledProcessError(cmd="", returncode=1)
 
         with self.assertRaises(MySQLClientError):
             self.mysql._run_mysqlsh_script("script")
 
-    @patch("subprocess.check_output")
-    def test_run_mysqlcli_script(self, _check_output):
+    @patch("subprocess.run")
+    def test_run_mysqlcli_script(self, _run):
         """Test a successful execution of run_mysqlsh_script."""
         self.mysql._run_mysqlcli_script("script", timeout=10)
 
-        _check_output.assert_called_once_with(
+        _run.assert_called_once_with(
             [
                 "charmed-mysql.mysql",
                 "-u",
@@ -88,88 +114,99 @@ class TestMySQL(unittest.TestCase):
                 "-e",
                 "script",
             ],
+            stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             timeout=10,
+            check=True,
+            text=True,
         )
 
-    @patch("subprocess.check_output")
-    def test_run_mysqlcli_script_exception(self, _check_output):
+    @patch("subprocess.run")
+    def test_run_mysqlcli_script_exception(self, _run):
         """Test a failed execution of run_mysqlsh_script."""
-        _check_output.side_effect = subprocess.CalledProcessError(cmd="", returncode=-1)
+        _run.side_effect = subprocess.CalledProcessError(cmd="", returncode=-1)
 
         with self.assertRaises(MySQLClientError):
             self.mysql._run_mysqlcli_script("script")
 
     @patch("mysql_vm_helpers.MySQL.wait_until_mysql_connection.retry.stop", return_value=1)
-    @patch("os.path.exists", return_value=False)
-    def test_wait_until_mysql_connection(self, _exists, _stop):
+    @patch("mysql_vm_helpers.MySQL.is_mysqld_running", return_value=False)
+    def test_wait_until_mysql_connection(self, _is_mysqld_running, _stop):
         """Test a failed execution of wait_until_mysql_connection."""
         with self.assertRaises(MySQLServiceNotRunningError):
             self.mysql.wait_until_mysql_connection()
 
     @patch("tempfile.NamedTemporaryFile")
-    @patch("subprocess.check_output")
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.fchown")
     @patch("mysql_vm_helpers.snap_service_operation")
     @patch("mysql_vm_helpers.MySQL.wait_until_mysql_connection")
     def test_reset_root_password_and_start_mysqld(
         self,
         _wait_until_mysql_connection,
         _snap_service_operation,
-        _check_output,
+        _fchown,
+        _uid,
+        _gid,
         _named_temporary_file,
     ):
         """Test a successful execution of reset_root_password_and_start_mysqld."""
         self.mysql.reset_root_password_and_start_mysqld()
 
         self.assertEqual(2, _named_temporary_file.call_count)
-        self.assertEqual(2, _check_output.call_count)
+        self.assertEqual(2, _fchown.call_count)
         self.assertEqual(1, _snap_service_operation.call_count)
         self.assertEqual(1, _wait_until_mysql_connection.call_count)
 
     @patch("tempfile.NamedTemporaryFile")
-    @patch("subprocess.check_output")
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.fchown")
     @patch("mysql_vm_helpers.snap_service_operation")
     @patch("mysql_vm_helpers.MySQL.wait_until_mysql_connection")
     def test_reset_root_password_and_start_mysqld_exception(
         self,
         _wait_until_mysql_connection,
         _snap_service_operation,
-        _check_output,
+        _fchown,
+        _uid,
+        _gid,
         _named_temporary_file,
     ):
         """Test a failed execution of reset_root_password_and_start_mysqld."""
-        _check_output.side_effect = subprocess.CalledProcessError(cmd="", returncode=-1)
+        _fchown.side_effect = PermissionError()
 
         with self.assertRaises(MySQLResetRootPasswordAndStartMySQLDError):
             self.mysql.reset_root_password_and_start_mysqld()
 
         self.assertEqual(2, _named_temporary_file.call_count)
-        self.assertEqual(1, _check_output.call_count)
+        self.assertEqual(1, _fchown.call_count)
         self.assertEqual(0, _snap_service_operation.call_count)
         self.assertEqual(0, _wait_until_mysql_connection.call_count)
 
         _named_temporary_file.reset_mock()
-        _check_output.reset_mock()
+        _fchown.reset_mock()
         _snap_service_operation.reset_mock()
         _wait_until_mysql_connection.reset_mock()
 
-        _check_output.side_effect = None
+        _fchown.side_effect = None
         _snap_service_operation.side_effect = SnapServiceOperationError()
 
         with self.assertRaises(MySQLResetRootPasswordAndStartMySQLDError):
             self.mysql.reset_root_password_and_start_mysqld()
 
         self.assertEqual(2, _named_temporary_file.call_count)
-        self.assertEqual(2, _check_output.call_count)
+        self.assertEqual(2, _fchown.call_count)
         self.assertEqual(1, _snap_service_operation.call_count)
         self.assertEqual(0, _wait_until_mysql_connection.call_count)
 
         _named_temporary_file.reset_mock()
-        _check_output.reset_mock()
+        _fchown.reset_mock()
         _snap_service_operation.reset_mock()
         _wait_until_mysql_connection.reset_mock()
 
-        _check_output.side_effect = None
+        _fchown.side_effect = None
         _snap_service_operation.side_effect = None
         _wait_until_mysql_connection.side_effect = MySQLServiceNotRunningError()
 
@@ -177,10 +214,47 @@ class TestMySQL(unittest.TestCase):
             self.mysql.reset_root_password_and_start_mysqld()
 
         self.assertEqual(2, _named_temporary_file.call_count)
-        self.assertEqual(2, _check_output.call_count)
+        self.assertEqual(2, _fchown.call_count)
         self.assertEqual(1, _snap_service_operation.call_count)
         self.assertEqual(1, _wait_until_mysql_connection.call_count)
 
+        _named_temporary_file.reset_mock()
+        _fchown.reset_mock()
+        _snap_service_operation.reset_mock()
+        _wait_until_mysql_connection.reset_mock()
+
+        _wait_until_mysql_connection.side_effect = None
+        _uid.side_effect = KeyError("getpwnam(): name not found: 'snap_daemon'")
+
+        with self.assertRaises(MySQLResetRootPasswordAndStartMySQLDError):
+            self.mysql.reset_root_password_and_start_mysqld()
+
+        self.assertEqual(0, _named_temporary_file.call_count)
+        self.assertEqual(0, _fchown.call_count)
+        self.assertEqual(0, _snap_service_operation.call_count)
+        self.assertEqual(0, _wait_until_mysql_connection.call_count)
+
+    @patch("mysql_vm_helpers.stop_after_delay", return_value=stop_after_attempt(3))
+    @patch("tenacity.nap.time.sleep")
+    @patch("os.path.ismount")
+    def test_is_volume_mounted(self, _ismount, _sleep, _stop_after_delay):
+        """Test is_volume_mounted() waiting for the data volume."""
+        _ismount.side_effect = [False, True]
+
+        self.assertTrue(is_volume_mounted())
+        self.assertEqual(_ismount.call_count, 2)
+        _ismount.assert_called_with("/var/snap/charmed-mysql/common")
+        _sleep.assert_called_once()
+
+        _ismount.reset_mock()
+        _sleep.reset_mock()
+        _ismount.side_effect = None
+        _ismount.return_value = False
+
+        self.assertFalse(is_volume_mounted())
+        self.assertEqual(_ismount.call_count, 3)
+        self.assertEqual(_sleep.call_count, 2)
+
     @patch("mysql_vm_helpers.snap.SnapCache")
     def test_snap_service_operation(self, _snap_cache):
         """Test a successful execution of function snap_service_operation."""
@@ -202,7 +276,8 @@ class TestMySQL(unittest.TestCase):
 
         snap_service_operation(CHARMED_MYSQL_SNAP_NAME, CHARMED_MYSQLD_SERVICE, "restart")
 
-        _snap_cache.assert_called_once()
+        # the snap cache is reused across operations
+        _snap_cache.assert_not_called()
         _charmed_mysql_mock.start.assert_not_called()
         _charmed_mysql_mock.restart.assert_called_once()
         _charmed_mysql_mock.stop.assert_not_called()
@@ -213,7 +288,7 @@ class TestMySQL(unittest.TestCase):
 
         snap_service_operation(CHARMED_MYSQL_SNAP_NAME, CHARMED_MYSQLD_SERVICE, "stop")
 
-        _snap_cache.assert_called_once()
+        _snap_cache.assert_not_called()
         _charmed_mysql_mock.start.assert_not_called()
         _charmed_mysql_mock.restart.assert_not_called()
         _charmed_mysql_mock.stop.assert_called_once()
@@ -230,24 +305,52 @@ class TestMySQL(unittest.TestCase):
 
         _snap_cache.assert_not_called()
 
-    @patch("shutil.chown")
-    @patch("os.chmod")
+    @patch("mysql_vm_helpers._run_snap_service_operation.retry.sleep")
+    @patch("mysql_vm_helpers.snap.SnapCache")
+    def test_snap_service_operation_retry(self, _snap_cache, _sleep):
+        """Test that transient snap errors are retried in snap_service_operation."""
+        _charmed_mysql_mock = MagicMock()
+        _cache = {CHARMED_MYSQL_SNAP_NAME: _charmed_mysql_mock}
+        _snap_cache.return_value.__getitem__.side_effect = _cache.__getitem__
+
+        _charmed_mysql_mock.start.side_effect = [snap.SnapError("transient"), None]
+        snap_service_operation(CHARMED_MYSQL_SNAP_NAME, CHARMED_MYSQLD_SERVICE, "start")
+
+        self.assertEqual(_charmed_mysql_mock.start.call_count, 2)
+        _sleep.assert_called_once()
+
+        _charmed_mysql_mock.start.reset_mock()
+        _charmed_mysql_mock.start.side_effect = snap.SnapError("failure")
+
+        with self.assertRaises(SnapServiceOperationError):
+            snap_service_operation(CHARMED_MYSQL_SNAP_NAME, CHARMED_MYSQLD_SERVICE, "start")
+
+        self.assertEqual(_charmed_mysql_mock.start.call_count, 3)
+
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.fchown")
+    @patch("os.fchmod")
     @patch("mysql_vm_helpers.MySQL.get_available_memory", return_value=16475447296)
     @patch(
         "mysql_vm_helpers.MySQL.get_innodb_buffer_pool_parameters", return_value=(1234, 5678, None)
     )
     @patch("mysql_vm_helpers.MySQL.get_max_connections", return_value=111)
     @patch("pathlib.Path")
-    @patch("builtins.open")
+    @patch("os.fdopen")
+    @patch("os.open", return_value=3)
     def test_write_mysqld_config(
         self,
-        _open,
+        _os_open,
+        _fdopen,
         _path,
         _get_innodb_buffer_pool_parameters,
         _get_max_connections,
         _get_available_memory,
-        _chmod,
-        _chown,
+        _fchmod,
+        _fchown,
+        _uid,
+        _gid,
     ):
         """Test successful execution of create_custom_mysqld_config."""
         self.maxDiff = None
@@ -255,7 +358,8 @@ class TestMySQL(unittest.TestCase):
         _path.return_value = _path_mock
 
         _open_mock = unittest.mock.mock_open()
-        _open.side_effect = _open_mock
+        _open_mock.return_value.fileno.return_value = 3
+        _fdopen.side_effect = _open_mock
 
         self.mysql.write_mysqld_config(profile="production", memory_limit=None)
 
@@ -280,15 +384,21 @@ class TestMySQL(unittest.TestCase):
         _get_max_connections.assert_called_once()
         _get_innodb_buffer_pool_parameters.assert_called_once()
         _path_mock.mkdir.assert_called_once_with(mode=0o755, parents=True, exist_ok=True)
-        _open.assert_called_once_with(MYSQLD_CUSTOM_CONFIG_FILE, "w", encoding="utf-8")
+        _os_open.assert_called_once_with(
+            MYSQLD_CUSTOM_CONFIG_FILE, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o640
+        )
+        _fchown.assert_called_once_with(3, 584788, 0)
+        _fchmod.assert_called_once_with(3, 0o640)
         _get_available_memory.assert_called_once()
 
         self.assertEqual(
             sorted(_open_mock.mock_calls),
             sorted(
                 [
-                    call(MYSQLD_CUSTOM_CONFIG_FILE, "w", encoding="utf-8"),
+                    call(3, "w", encoding="utf-8"),
                     call().__enter__(),
+                    call().fileno(),
+                    call().fileno(),
                     call().write(config),
                     call().__exit__(None, None, None),
                 ]
@@ -299,6 +409,12 @@ class TestMySQL(unittest.TestCase):
         _open_mock.reset_mock()
         self.mysql.write_mysqld_config(profile="testing", memory_limit=None)
 
+        _os_open.assert_called_with(
+            f"{MYSQLD_CONFIG_DIRECTORY}/z-custom-mysqld.cnf",
+            os.O_CREAT | os.O_WRONLY | os.O_TRUNC,
+            0o640,
+        )
+
         config = "\n".join(
             (
                 "[mysqld]",
@@ -323,14 +439,39 @@ class TestMySQL(unittest.TestCase):
             sorted(_open_mock.mock_calls),
             sorted(
                 [
-                    call(f"{MYSQLD_CONFIG_DIRECTORY}/z-custom-mysqld.cnf", "w", encoding="utf-8"),
+                    call(3, "w", encoding="utf-8"),
                     call().__enter__(),
+                    call().fileno(),
+                    call().fileno(),
                     call().write(config),
                     call().__exit__(None, None, None),
                 ]
             ),
         )
 
+    @patch("os.fchown")
+    def test_write_content_to_file(self, _fchown):
+        """Test write_content_to_file() on a real file."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "file")
+            with open(path, "w") as file:
+                file.write("previous")
+            os.chmod(path, 0o600)
+
+            # unknown owners fail before the file is truncated
+            with self.assertRaises(KeyError):
+                self.mysql.write_content_to_file(path, "content", owner="no-such-user")
+            with open(path) as file:
+                self.assertEqual(file.read(), "previous")
+            _fchown.assert_not_called()
+
+            self.mysql.write_content_to_file(path, "content", owner="root", group="root")
+            with open(path) as file:
+                self.assertEqual(file.read(), "content")
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            _fchown.assert_called_once()
+            self.assertEqual(_fchown.call_args.args[1:], (0, 0))
+
     @patch("mysql_vm_helpers.MySQL.get_innodb_buffer_pool_parameters", return_value=(1234, 5678))
     @patch("pathlib.Path")
     @patch("builtins.open")
@@ -353,8 +494,7 @@ class TestMySQL(unittest.TestCase):
     def test_execute_commands(self, _run):
         """Test a successful execution of _execute_commands."""
         self.mysql._execute_commands(
-            ["ls", "-la", "|", "wc", "-l"],
-            bash=True,
+            ["ls", "-la"],
             user="test_user",
             group="test_group",
             env_extra={"envA": "valueA"},
@@ -362,7 +502,7 @@ class TestMySQL(unittest.TestCase):
         env = os.environ
         env.update({"envA": "valueA"})
         _run.assert_called_once_with(
-            ["bash", "-c", "set -o pipefail; ls -la | wc -l"],
+            ["ls", "-la"],
             user="test_user",
             group="test_group",
             env=env,
@@ -379,19 +519,84 @@ class TestMySQL(unittest.TestCase):
         with self.assertRaises(MySQLExecError):
             self.mysql._execute_commands(
                 ["ls", "-la"],
-                bash=True,
                 user="test_user",
                 group="test_group",
                 env_extra={"envA": "valueA"},
             )
 
-    @patch("os.path.exists", return_value=True)
-    def test_is_mysqld_running(self, _path_exists):
+    def test_execute_commands_pipeline(self):
+        """Test execution of a pipeline with _execute_commands."""
+        stdout, stderr = self.mysql._execute_commands(
+            ["printf", "%s\\n", "$envA", "hello world", "|", "tr", "a-z", "A-Z"],
+            bash=True,
+            env_extra={"envA": "valueA"},
+        )
+
+        # arguments are passed verbatim, without shell expansion or word splitting
+        self.assertEqual(stdout, "$ENVA\nHELLO WORLD")
+        self.assertEqual(stderr, "")
+
+        # the pipeline fails if any of its stages fails
+        with self.assertRaises(MySQLExecError):
+            self.mysql._execute_commands(["false", "|", "cat"], bash=True)
+
+    @patch("charms.mysql.v0.mysql.MySQLBase.restore_backup", return_value=("stdout", "stderr"))
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", side_effect={"root": 0, "snap_daemon": 584788}.get)
+    @patch("mysql_vm_helpers._chown_recursively")
+    @patch("os.chmod")
+    def test_restore_backup(self, _chmod, _chown_recursively, _uid, _gid, _restore_backup):
+        """Test execution of restore_backup()."""
+        self.assertEqual(self.mysql.restore_backup("backup_location"), ("stdout", "stderr"))
+
+        _restore_backup.assert_called_once()
+        self.assertEqual(
+            _chmod.call_args_list, [call(MYSQL_DATA_DIR, 0o770), call(MYSQL_DATA_DIR, 0o750)]
+        )
+        _chown_recursively.assert_called_once_with(MYSQL_DATA_DIR, 584788, 0)
+
+    @patch("charms.mysql.v0.mysql.MySQLBase.restore_backup", return_value=("stdout", "stderr"))
+    @patch("mysql_vm_helpers._gid", return_value=0)
+    @patch("mysql_vm_helpers._uid", return_value=0)
+    @patch("mysql_vm_helpers._chown_recursively")
+    @patch("os.chmod")
+    def test_restore_backup_exception(
+        self, _chmod, _chown_recursively, _uid, _gid, _restore_backup
+    ):
+        """Test failure of restore_backup()."""
+        # failure opening up the data directory before restoring
+        _chmod.side_effect = PermissionError()
+
+        with self.assertRaises(MySQLRestoreBackupError):
+            self.mysql.restore_backup("backup_location")
+
+        _restore_backup.assert_not_called()
+
+        # failure reverting permissions after restoring
+        _chmod.side_effect = [None, PermissionError()]
+
+        with self.assertRaises(MySQLRestoreBackupError):
+            self.mysql.restore_backup("backup_location")
+
+        _restore_backup.assert_called_once()
+        _chown_recursively.assert_not_called()
+
+    def test_is_mysqld_running(self):
         """Test execution of is_mysqld_running()."""
-        self.assertTrue(self.mysql.is_mysqld_running())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sock_file = os.path.join(tmp_dir, "mysqld.sock")
 
-        _path_exists.return_value = False
-        self.assertFalse(self.mysql.is_mysqld_running())
+            with patch("mysql_vm_helpers.MYSQLD_SOCK_FILE", sock_file):
+                self.assertFalse(self.mysql.is_mysqld_running())
+
+                # a stale regular file is not a running mysqld
+                open(sock_file, "w").close()
+                self.assertFalse(self.mysql.is_mysqld_running())
+                os.remove(sock_file)
+
+                with socket.socket(socket.AF_UNIX) as sock:
+                    sock.bind(sock_file)
+                    self.assertTrue(self.mysql.is_mysqld_running())
 
     @patch("mysql_vm_helpers.snap_service_operation")
     def test_stop_mysqld(self, _snap_service_operation):
@@ -444,13 +649,17 @@ class TestMySQL(unittest.TestCase):
         with self.assertRaises(MySQLStartMySQLDError):
             self.mysql.start_mysqld()
 
-    @patch("os.system")
+    @patch("mysql_vm_helpers._chown_recursively")
+    @patch("mysql_vm_helpers._uid", return_value=584788)
+    @patch("os.stat")
     @patch("pathlib.Path")
     @patch("subprocess.check_call")
     @patch("subprocess.run")
     @patch("os.path.exists", return_value=True)
     @patch("mysql_vm_helpers.snap.SnapCache")
-    def test_install_snap(self, _cache, _path_exists, _run, _check_call, _pathlib, _system):
+    def test_install_snap(
+        self, _cache, _path_exists, _run, _check_call, _pathlib, _stat, _uid, _chown_recursively
+    ):
         """Test execution of install_snap()."""
         _mysql_snap = MagicMock()
         _cache.return_value = {CHARMED_MYSQL_SNAP_NAME: _mysql_snap}
@@ -465,7 +674,38 @@ class TestMySQL(unittest.TestCase):
         self.mysql.install_and_configure_mysql_dependencies()
 
         _check_call.assert_called_once_with(["charmed-mysql.mysqlsh", "--help"], stderr=-1)
-        _run.assert_called_once_with(["snap", "alias", "charmed-mysql.mysql", "mysql"], check=True)
+        _run.assert_called_once_with(
+            ["snap", "alias", "charmed-mysql.mysql", "mysql"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        _chown_recursively.assert_called_once_with("/var/snap/charmed-mysql/common", 584788)
+
+        # ownership is left untouched when already correct
+        _chown_recursively.reset_mock()
+        _stat.return_value.st_uid = 584788
+
+        self.mysql.install_and_configure_mysql_dependencies()
+
+        _chown_recursively.assert_not_called()
+
+    @patch("os.chown")
+    def test_chown_recursively(self, _chown):
+        """Test that _chown_recursively only changes ownership of mismatched entries."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "a", "b"))
+            for file_path in ("a/file", "a/b/file"):
+                open(os.path.join(tmp_dir, file_path), "w").close()
+
+            _chown_recursively(tmp_dir, os.getuid())
+            _chown.assert_not_called()
+
+            _chown_recursively(tmp_dir, os.getuid() + 1)
+            self.assertEqual(_chown.call_count, 5)
+            _chown.assert_any_call(
+                os.path.join(tmp_dir, "a", "b", "file"), os.getuid() + 1, -1, follow_symlinks=False
+            )
 
     def test_get_available_memory(self):
         meminfo = (
@@ -478,9 +718,123 @@ class TestMySQL(unittest.TestCase):
             "Active:         11890336 kB"
         )
 
-        with patch("builtins.open", mock_open(read_data=meminfo)):
+        with patch("builtins.open", mock_open(read_data=meminfo)) as _open:
             self.assertEqual(self.mysql.get_available_memory(), 16475635712)
 
+            # the charm builds a MySQL instance per use, and all of them share one read
+            other_mysql = MySQL(
+                "127.0.0.1",
+                "test_cluster",
+                "test_cluster_set",
+                "password",
+                "serverconfig",
+                "serverconfigpassword",
+                "clusteradmin",
+                "clusteradminpassword",
+                "monitoring",
+                "monitoringpassword",
+                "backups",
+                "backupspassword",
+                None,
+            )
+            self.assertEqual(other_mysql.get_available_memory(), 16475635712)
+            _open.assert_called_once_with("/proc/meminfo")
+
+        _total_memory.cache_clear()
         with patch("builtins.open", mock_open(read_data="")):
             with self.assertRaises(MySQLGetAvailableMemoryError):
                 self.mysql.get_available_memory()
+
+    def test_is_data_dir_initialised(self):
+        """Test execution of is_data_dir_initialised()."""
+        expected_content = [
+            "mysql",
+            "public_key.pem",
+            "sys",
+            "ca.pem",
+            "client-key.pem",
+            "mysql.ibd",
+            "auto.cnf",
+            "server-cert.pem",
+            "ib_buffer_pool",
+            "server-key.pem",
+            "undo_002",
+            "#innodb_redo",
+            "undo_001",
+            "#innodb_temp",
+            "private_key.pem",
+            "client-cert.pem",
+            "ca-key.pem",
+            "performance_schema",
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch("mysql_vm_helpers.MYSQL_DATA_DIR", tmp_dir):
+                self.assertFalse(self.mysql.is_data_dir_initialised())
+
+                for name in expected_content[:-1] + ["test.ibd"]:
+                    open(os.path.join(tmp_dir, name), "w").close()
+                self.assertFalse(self.mysql.is_data_dir_initialised())
+
+                open(os.path.join(tmp_dir, expected_content[-1]), "w").close()
+                self.assertTrue(self.mysql.is_data_dir_initialised())
+
+        with patch("mysql_vm_helpers.MYSQL_DATA_DIR", "/nonexistent"):
+            self.assertFalse(self.mysql.is_data_dir_initialised())
+
+    @patch("mysql_vm_helpers.MySQL.write_content_to_file")
+    def test_setup_logrotate_and_cron_renders_template(self, _write_content_to_file):
+        """Test setup_logrotate_and_cron() with the real logrotate template."""
+        self.mysql.charm = MagicMock()
+        self.mysql.charm.charm_dir = "/var/lib/juju/agents/unit-mysql-0/charm"
+        self.mysql.charm.unit.name = "mysql/0"
+
+        self.mysql.setup_logrotate_and_cron()
+
+        rendered = _write_content_to_file.mock_calls[0].kwargs["content"]
+        self.assertIn("su snap_daemon snap_daemon\n", rendered)
+        self.assertIn("/var/snap/charmed-mysql/common/var/log/mysql/error.log {\n", rendered)
+        self.assertIn(
+            '"$juju_command" -u mysql/0 LOGS_TYPE=ERROR JUJU_DISPATCH_PATH=hooks/flush_mysql_logs '
+            "/var/lib/juju/agents/unit-mysql-0/charm/dispatch\n",
+            rendered,
+        )
+        self.assertNotIn("{{", rendered)
+
+        # the parsed template is reused by later calls
+        template = _get_template("logrotate.j2")
+        self.assertIs(_get_template("logrotate.j2"), template)
+        self.assertEqual(_get_template.cache_info().misses, 1)
+
+    @patch("mysql_vm_helpers.MySQL.write_content_to_file")
+    @patch("mysql_vm_helpers._get_template")
+    def test_setup_logrotate_and_cron(self, _get_template, _write_content_to_file):
+        """Test execution of setup_logrotate_and_cron()."""
+        self.mysql.charm = MagicMock()
+        _get_template.return_value.render.return_value = "rendered"
+
+        self.mysql.setup_logrotate_and_cron()
+
+        _get_template.assert_called_once_with("logrotate.j2")
+        self.assertEqual(
+            _write_content_to_file.mock_calls,
+            [
+                call(
+                    path="/etc/logrotate.d/flush_mysql_logs",
+                    content="rendered",
+                    owner="root",
+                    group="root",
+                    permission=0o644,
+                ),
+                call(
+                    path="/etc/cron.d/flush_mysql_logs",
+                    content=(
+                        "* 1-23 * * * root logrotate -f /etc/logrotate.d/flush_mysql_logs\n"
+                        "1-59 0 * * * root logrotate -f /etc/logrotate.d/flush_mysql_logs\n"
+                    ),
+                    owner="root",
+                    group="root",
+                    permission=0o644,
+                ),
+            ],
+        )